@@ -0,0 +1,241 @@
+import bisect
+import itertools
+import json
+import math
+import threading
+from collections import deque
+from datetime import datetime
+
+from src.trade_rebalance import get_drift_price
+
+
+class Alert:
+    """
+    A price level on a pair that triggers once when the price crosses it
+
+    Attributes:
+        rising: True if it triggers when the price goes up through the level, False when it goes down
+        group: optional tag, to remove related alerts together (e.g. all the drift alerts when balances change)
+    """
+    def __init__(self, alert_id, pair, kind, level, rising, message, group=None):
+        self.alert_id = alert_id
+        self.pair = pair
+        self.kind = kind
+        self.level = level
+        self.rising = rising
+        self.message = message
+        self.group = group
+
+
+class AlertEngine:
+    """
+    Evaluates price alerts on every new price (tick) of each pair
+
+    Every condition is turned into a price level when it is registered. Levels are kept in sorted lists per pair
+    and direction, so a tick only looks at the levels between the previous and the new price:
+    cost per tick is O(log n + fired alerts), not O(n). An alert whose level the last price is already past when it
+    is registered triggers right away.
+
+    Thread-safe, so that a PricePoller can feed ticks while alerts are registered from elsewhere.
+    """
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self._alert_ids = itertools.count()
+        self._alerts = {}
+        # pair -> sorted list of (level, alert_id)
+        self._rising_levels = {}
+        self._falling_levels = {}
+        # group -> key its alerts were last registered for
+        self._group_keys = {}
+        self._lock = threading.RLock()
+        self.last_prices = {}
+
+    def _levels(self, pair, rising):
+        levels_by_pair = self._rising_levels if rising else self._falling_levels
+        return levels_by_pair.setdefault(pair, [])
+
+    def _add(self, pair, kind, level, rising, message, group):
+        with self._lock:
+            alert = Alert(next(self._alert_ids), pair, kind, level, rising, message, group)
+
+            # A level the price is already past would never be crossed again, so it triggers right away
+            last_price = self.last_prices.get(pair)
+            already_crossed = last_price is not None and (last_price >= level if rising else last_price <= level)
+            if not already_crossed:
+                self._alerts[alert.alert_id] = alert
+                bisect.insort(self._levels(pair, rising), (level, alert.alert_id))
+
+        if already_crossed:
+            self._notify(alert, last_price)
+
+        return alert.alert_id
+
+    def add_price_level(self, pair, level, message=None, group=None):
+        """
+        Alert when the price crosses level, in whichever direction it is from the last known price
+        """
+        last_price = self.last_prices.get(pair)
+        if last_price is None:
+            raise ValueError(f"No price received yet for {pair}, cannot tell the crossing direction")
+
+        rising = level > last_price
+        message = message or f"{pair} crossed {level:g}"
+
+        return self._add(pair, "price_level", level, rising, message, group)
+
+    def add_percent_move(self, pair, reference_price, percent, message=None, group=None):
+        """
+        Alert when the price moves percent (positive or negative) away from reference_price, e.g. the last trade
+        """
+        level = reference_price * (1 + percent / 100)
+        message = message or f"{pair} moved {percent:+g}% from {reference_price:g}"
+
+        return self._add(pair, "percent_move", level, percent > 0, message, group)
+
+    def add_proportion_drift(self, pair, eth_units, dollars_liquid, drift, message=None, group=None):
+        """
+        Alert when the ETH proportion of ETH + liquid dollars drifts `drift` away from its target proportion.
+        Only valid while the balances don't change, re-register them (with a group) after each balance update.
+        """
+        level = get_drift_price(eth_units, dollars_liquid, drift)
+        if level is None:
+            raise ValueError(f"A drift of {drift:+.1%} can't be reached with the current balances")
+
+        action = "SELL" if drift > 0 else "BUY"
+        message = message or f"{pair} ETH proportion drifted {drift:+.1%} from its target: {action}"
+
+        return self._add(pair, "proportion_drift", level, drift > 0, message, group)
+
+    def remove(self, alert_id):
+        with self._lock:
+            alert = self._alerts.pop(alert_id)
+            levels = self._levels(alert.pair, alert.rising)
+            del levels[bisect.bisect_left(levels, (alert.level, alert_id))]
+
+    def remove_group(self, group):
+        with self._lock:
+            for alert_id in [alert.alert_id for alert in self._alerts.values() if alert.group == group]:
+                self.remove(alert_id)
+
+            self._group_keys.pop(group, None)
+
+    def register_group(self, group, key, register):
+        """
+        Replace the alerts of a group by the ones added by register(group), only if key changed since the last time.
+        For instance, drift alerts keyed by the balances they were computed for.
+        """
+        with self._lock:
+            if group in self._group_keys and self._group_keys[group] == key:
+                return
+
+            self.remove_group(group)
+            register(group)
+            self._group_keys[group] = key
+
+    def on_price(self, pair, price):
+        """
+        Feed a new price, triggering (and removing) every alert whose level was crossed since the previous price
+
+        Returns:
+            list of triggered Alert
+        """
+        with self._lock:
+            previous_price = self.last_prices.get(pair)
+            self.last_prices[pair] = price
+            if previous_price is None or price == previous_price:
+                return []
+
+            if price > previous_price:
+                levels = self._levels(pair, rising=True)
+                start = bisect.bisect_right(levels, (previous_price, math.inf))
+                end = bisect.bisect_right(levels, (price, math.inf))
+            else:
+                levels = self._levels(pair, rising=False)
+                start = bisect.bisect_left(levels, (price, -1))
+                end = bisect.bisect_left(levels, (previous_price, -1))
+
+            crossed = levels[start:end]
+            del levels[start:end]
+
+            triggered = [self._alerts.pop(alert_id) for _, alert_id in crossed]
+
+        for alert in triggered:
+            self._notify(alert, price)
+
+        return triggered
+
+    def _notify(self, alert, price):
+        event = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "pair": alert.pair,
+            "kind": alert.kind,
+            "level": alert.level,
+            "price": price,
+            "message": alert.message,
+        }
+        for sink in self.sinks:
+            sink.send(event)
+
+
+class StdoutSink:
+    def send(self, event):
+        print(f"[ALERT {event['time']}] {event['message']} (price: {event['price']:g})")
+
+
+class FileSink:
+    """
+    Appends each alert as a JSON line to a local file
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, event):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(event) + "\n")
+
+
+class WebhookStandInSink:
+    """
+    Keeps the JSON payloads a webhook would receive, without any network access
+
+    Attributes:
+        payloads: latest payloads, at most max_payloads
+    """
+    def __init__(self, max_payloads=1000):
+        self.payloads = deque(maxlen=max_payloads)
+
+    def send(self, event):
+        self.payloads.append(json.dumps(event))
+
+
+class PricePoller:
+    """
+    Background thread feeding an AlertEngine with fresh prices every interval_secs, whether the dashboard is open or not
+
+    Args:
+        get_prices: function returning a dict of pair -> current price
+    """
+    def __init__(self, alert_engine, get_prices, interval_secs):
+        self.alert_engine = alert_engine
+        self.get_prices = get_prices
+        self.interval_secs = interval_secs
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="price-poller", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                for pair, price in self.get_prices().items():
+                    self.alert_engine.on_price(pair, price)
+            except Exception as e:
+                # A failed request shouldn't stop the alerts, the next poll will try again
+                print(f"Price polling failed: {e}")
+
+            self._stopped.wait(self.interval_secs)
+
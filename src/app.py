@@ -3,8 +3,18 @@ import streamlit as st
 import time
 import matplotlib.pyplot as plt
 
-from src.config import WHITELISTED_ASSETS, asset_to_step
+from src.alerts import AlertEngine, FileSink, PricePoller, StdoutSink
+from src.config import (
+    WHITELISTED_ASSETS,
+    ALERT_DRIFT_PROPORTION,
+    ALERT_LAST_TRADE_MOVE_PERCENT,
+    ALERT_POLL_SECS,
+    ALERTS_FILE,
+    asset_to_step,
+    assets_2_pair,
+)
 from src.kraken import KrakenAPI, Kraken
+from src.profiling import profiler
 from src.utils import load_keys, round_sig_dict
 from src.trade_rebalance import analyze_and_trade
 
@@ -16,12 +26,13 @@ kraken = Kraken(kraken_api_handler)
 
 def main():
     set_page_config()
-    load_info()
+    with profiler.section("load_info"):
+        load_info()
 
     st.button("UPDATE", on_click=update_info)
 
     col_balances, col_notes = st.columns([1, 2], gap="large")
-    with col_balances:
+    with col_balances, profiler.section("balances"):
         balances_info = [{"asset": asset, "volume": volume, "volume_USD": st.session_state.balances_usd[asset]} for asset, volume in st.session_state.balances.items()]
         balances_df = pd.DataFrame(balances_info)
 
@@ -33,7 +44,7 @@ def main():
         st.header(f"My Balance: {round(balance_total)}$")
         st.dataframe(balances_df)
 
-    with col_notes:
+    with col_notes, profiler.section("notes"):
         st.subheader("**Notas:**")
         new_note = st.text_input("Añade una nota:")
         if st.button("Añadir nota"):
@@ -57,6 +68,9 @@ def main():
         ui_trade_asset("XETH")
         ui_last_trades("ETH")
 
+    if profiler.enabled:
+        ui_profiler()
+
 
 def set_page_config():
     st.set_page_config(
@@ -85,6 +99,19 @@ def add_note(note):
     with open("notes.txt", "a") as f:
         f.write(f"{date}: {note.replace('$', '\\$')}\n")
 
+def get_usd_pair_prices():
+    return {assets_2_pair[(asset, "ZUSD")]: price for asset, price in kraken.get_current_prices().items()}
+
+
+@st.cache_resource
+def get_alert_engine():
+    # One engine per process, shared by every browser session and fed by its own polling thread
+    alert_engine = AlertEngine(sinks=[StdoutSink(), FileSink(ALERTS_FILE)])
+    PricePoller(alert_engine, get_usd_pair_prices, ALERT_POLL_SECS).start()
+
+    return alert_engine
+
+
 def update_balances():
     balances = kraken.get_assets_balances()
     balances = round_sig_dict(balances, 3)
@@ -95,6 +122,33 @@ def update_balances():
     st.session_state.balances = balances
     st.session_state.balances_usd = balances_usd
 
+    update_drift_alerts()
+
+
+def update_drift_alerts():
+    # Drift alerts depend on the balances, so they are only registered again when these change
+    eth_units = st.session_state.balances.get("XETH", 0)
+    dollars_liquid = st.session_state.balances.get("ZUSD", 0)
+
+    def register(group):
+        for drift in [ALERT_DRIFT_PROPORTION, -ALERT_DRIFT_PROPORTION]:
+            try:
+                get_alert_engine().add_proportion_drift(assets_2_pair[("XETH", "ZUSD")], eth_units, dollars_liquid, drift, group=group)
+            except ValueError:
+                pass
+
+    get_alert_engine().register_group("drift", (eth_units, dollars_liquid), register)
+
+
+def update_last_trade_alerts(asset_key, latest_trades_df):
+    last_trade = latest_trades_df.iloc[0]
+
+    def register(group):
+        for percent in [ALERT_LAST_TRADE_MOVE_PERCENT, -ALERT_LAST_TRADE_MOVE_PERCENT]:
+            get_alert_engine().add_percent_move(assets_2_pair[(asset_key, "ZUSD")], last_trade["Fill price"], percent, group=group)
+
+    get_alert_engine().register_group(f"last_trade_{asset_key}", tuple(last_trade), register)
+
 
 def update_prices():
     prices = kraken.get_current_prices()
@@ -134,6 +188,7 @@ def confirm_trade():
     st.rerun()
 
 
+@profiler.profiled
 def get_latest_trades(asset_filter=None):
     trades_data = kraken.get_trades_history()
     trades = trades_data.get('result', {}).get('trades', {})
@@ -167,17 +222,20 @@ def get_latest_trades(asset_filter=None):
             amount_usd = "$0"
         # Price, round based on asset type: BTC to -2, ETH to -1
         try:
+            fill_price = float(trade.get('price', 0))
             if asset_filter == 'BTC':
-                price = round(float(trade.get('price', 0)), -2)  # Round to nearest 100
+                price = round(fill_price, -2)  # Round to nearest 100
             else:  # ETH
-                price = round(float(trade.get('price', 0)), -1)  # Round to nearest 10
+                price = round(fill_price, -1)  # Round to nearest 10
         except (ValueError, TypeError):
-            price = 0.0
+            fill_price = price = 0.0
         rows.append({
             'Date': date,
             'Type': buy_sell,
             'Price': price,
             'Amount $': amount_usd,
+            # Unrounded, for the alerts
+            'Fill price': fill_price,
         })
     df = pd.DataFrame(rows)
     return df
@@ -190,6 +248,7 @@ def styled_trade_table(df):
     return df.style.apply(lambda col: [highlight_type(v) for v in col], subset=['Type']).format({'Price': '{:.0f}'})
 
 
+@profiler.profiled
 def trade_scatter_plot(df, asset_name):
     df['Timestamp'] = pd.to_datetime(df['Date'], format='%d %b %Y')
     df['AmountNum'] = df['Amount $'].str.replace(r'[$,]', '', regex=True).astype(float)
@@ -254,17 +313,21 @@ def annotate_price_changes(asset_key: str, ax, df, today):
             fontweight='bold')
 
 
+@profiler.profiled
 def ui_last_trades(asset):
     st.subheader(f"Latest {asset} Orders")
     latest_trades_df = get_latest_trades(asset_filter=asset)
     show_last_n = 3
-    st.dataframe(styled_trade_table(latest_trades_df.head(show_last_n)), use_container_width=True, hide_index=True)
+    st.dataframe(styled_trade_table(latest_trades_df.head(show_last_n).drop(columns=['Fill price'])), use_container_width=True, hide_index=True)
     
     if not latest_trades_df.empty:
+        update_last_trade_alerts('XXBT' if asset == 'BTC' else 'XETH', latest_trades_df)
+
         fig = trade_scatter_plot(latest_trades_df, asset)
         st.pyplot(fig, use_container_width=True)
 
 
+@profiler.profiled
 def ui_trade_asset(asset):
     asset_price = st.session_state.prices.get(asset)
     st.header(asset)
@@ -275,7 +338,8 @@ def ui_trade_asset(asset):
         eth_units = st.session_state.balances.get("XETH", 0)
         dollars_liquid = st.session_state.balances.get("ZUSD", 0)
 
-        action, amount = analyze_and_trade(eth_units, asset_price, dollars_liquid)
+        with profiler.section("analyze_and_trade"):
+            action, amount = analyze_and_trade(eth_units, asset_price, dollars_liquid)
 
         if amount > 1000:
             st.success(f"**{action}: {amount:.0f} $**")
@@ -306,5 +370,21 @@ def ui_trade_asset(asset):
                     st.error("Something went wrong")
 
 
+def ui_profiler():
+    with st.expander("Render profile"):
+        st.dataframe(pd.DataFrame(profiler.summary()).round(1), hide_index=True)
+
+        if st.button("Profile next rerun with cProfile"):
+            profiler.request_cprofile()
+            st.rerun()
+
+        if profiler.last_cprofile_text:
+            st.caption(f"Last cProfile stats saved to {profiler.last_cprofile_path}")
+            st.code(profiler.last_cprofile_text)
+
+
 if __name__ == "__main__":
-    main()
+    profiler.run(main)
+    if profiler.take_new_cprofile():
+        # The panel of the profiled rerun was drawn before its stats existed, rerun once to show them
+        st.rerun()
@@ -13,3 +13,18 @@ pair_2_assets = {
 }
 
 assets_2_pair = {v: k for k, v in pair_2_assets.items()}
+
+# Fallback order limits per pair, used when they can't be fetched from Kraken's AssetPairs endpoint
+pair_order_limits = {
+    'XXBTZUSD': {"ordermin": 0.00005, "lot_decimals": 8},
+    'XETHZUSD': {"ordermin": 0.002, "lot_decimals": 8},
+    'XETHXXBT': {"ordermin": 0.002, "lot_decimals": 8},
+}
+
+# Alert when the ETH proportion drifts this much from its target, see src/alerts.py
+ALERT_DRIFT_PROPORTION = 0.05
+ALERTS_FILE = "alerts.log"
+# Alert when the price moves this percent (up or down) from the last trade of an asset
+ALERT_LAST_TRADE_MOVE_PERCENT = 5
+# Seconds between price updates sent to the alerts, independently of the dashboard reruns
+ALERT_POLL_SECS = 30
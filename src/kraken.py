@@ -1,9 +1,11 @@
 from datetime import datetime
 import pandas as pd
 import requests
+import threading
 import time
 
-from src.config import WHITELISTED_ASSETS, assets_2_pair
+from src.config import WHITELISTED_ASSETS, assets_2_pair, pair_order_limits
+from src.profiling import profiler
 from src.utils import get_kraken_signature, load_keys
 
 
@@ -16,6 +18,8 @@ class KrakenAPI:
             'User-Agent': 'Kraken REST API',
             'API-Key': self.key,
         }
+        self._nonce_lock = threading.Lock()
+        self._last_nonce = 0
 
         self.check_connection()
 
@@ -35,14 +39,21 @@ class KrakenAPI:
 
         if data is None:
             data = {}
-        data['nonce'] = str(int(1000 * time.time()))
+        data['nonce'] = str(self._next_nonce())
 
         headers = self._headers.copy()
         headers['API-Sign'] = get_kraken_signature(urlpath, data, self.secret)
 
-        response = requests.post(url, data=data, headers=headers)
+        with profiler.network():
+            response = requests.post(url, data=data, headers=headers)
         return response.json()
 
+    def _next_nonce(self):
+        # Kraken rejects nonces that don't increase, which can happen with several requests in the same millisecond
+        with self._nonce_lock:
+            self._last_nonce = max(int(1000 * time.time()), self._last_nonce + 1)
+            return self._last_nonce
+
     def get_assets_balances(self):
         return self._query('/0/private/Balance')
 
@@ -52,12 +63,18 @@ class KrakenAPI:
     def get_ticker_info(self, pair):
         return self._query('/0/public/Ticker', data={'pair': pair})
 
+    def get_asset_pairs(self, pairs):
+        return self._query('/0/public/AssetPairs', data={'pair': ",".join(pairs)})
+
     def get_order_book(self, pair):
         return self._query('/0/public/Depth', data={'pair': pair})
 
     def get_ohlc(self, pair, interval_mins):
         return self._query('/0/public/OHLC', data={'pair': pair, 'interval': interval_mins})
 
+    def get_recent_trades(self, pair, since=0):
+        return self._query('/0/public/Trades', data={'pair': pair, 'since': since})
+
     def add_market_order(self, pair, buy_or_sell, volume):
         data = {
             'pair': pair,
@@ -81,19 +98,32 @@ class Kraken:
         return assets_balances_relevant
 
     def get_current_prices(self):
-        prices = {}
-        for asset in WHITELISTED_ASSETS:
-            if asset != "ZUSD":  # No need to get price for USD
-                pair = assets_2_pair[(asset, "ZUSD")]
-                ticker_info = self.api.get_ticker_info(pair).get("result")
-                current_price = float(ticker_info.get(pair).get("c")[0])
-                prices[asset] = current_price
+        asset_2_pair = {asset: assets_2_pair[(asset, "ZUSD")] for asset in WHITELISTED_ASSETS if asset != "ZUSD"}
+
+        # A single ticker request for all the pairs
+        ticker_info = self.api.get_ticker_info(",".join(asset_2_pair.values())).get("result")
+        prices = {asset: float(ticker_info.get(pair).get("c")[0]) for asset, pair in asset_2_pair.items()}
 
         return prices
 
     def get_trades_history(self):
         return self.api.get_trades_history()
 
+    def get_pair_order_limits(self, pairs):
+        """
+        Minimum order volume and volume decimals of each pair, falling back to config.py if Kraken doesn't answer
+        """
+        response = self.api.get_asset_pairs(pairs)
+        if response.get("error"):
+            print(response["error"])
+            return {pair: pair_order_limits[pair] for pair in pairs}
+
+        asset_pairs = response["result"]
+        return {
+            pair: {"ordermin": float(asset_pairs[pair]["ordermin"]), "lot_decimals": int(asset_pairs[pair]["lot_decimals"])}
+            for pair in pairs
+        }
+
     def get_prices_history(self, pair, interval_mins=1):
         ohlc_history = self.api.get_ohlc(pair, interval_mins).get("result")
         ohlc_history = ohlc_history.get(pair)
@@ -123,6 +153,18 @@ class Kraken:
     def from_usd(self, asset, usd_amount):
         return usd_amount / self.to_usd(asset, 1)
 
+    def add_market_order(self, pair, buy_or_sell, volume):
+        """
+        Market order on any pair, e.g. "buy" on XETHXXBT buys ETH with BTC
+        """
+        response = self.api.add_market_order(pair, buy_or_sell, volume)
+
+        if response["error"]:
+            print(response["error"])
+            return False
+        else:
+            return True
+
     def sell_market(self, asset, volume):
         """
         Sells asset to get USD
@@ -1,19 +1,28 @@
+import pandas as pd
+
+from src.old_trading.price_arrays import PriceArrays
+from src.old_trading.resampling import walk_forward_splits
+from src.old_trading.strategies import StrategyFactory
+
+
 def backtest(price_history, signals, initial_balance=10000):
     """
     Simple backtest function to compute strategy performance.
 
     Args:
-    - price_history: DataFrame with historical price data.
-    - signals: Series or list of {-1, 0, 1} values. 1 for buy, -1 for sell, 0 for hold.
+    - price_history: DataFrame or PriceArrays with historical price data.
+    - signals: array, Series or list of {-1, 0, 1} values. 1 for buy, -1 for sell, 0 for hold.
     - initial_balance: starting balance in your trading account.
 
     Returns:
-    - A dictionary with final_balance, total_profit/loss, and trade count.
+    - A dictionary with final_balance, total_profit/loss, max drawdown, and trade count.
     """
 
     balance = initial_balance
     position = 0
     trade_count = 0
+    peak_equity = initial_balance
+    max_drawdown = 0
 
     # Assume the price_history is in the same order as signals and has a "price" column
     for price, signal in zip(price_history["price"], signals):
@@ -27,6 +36,10 @@ def backtest(price_history, signals, initial_balance=10000):
             position = 0
             trade_count += 1
 
+        equity = balance + position * price
+        peak_equity = max(peak_equity, equity)
+        max_drawdown = max(max_drawdown, (peak_equity - equity) / peak_equity)
+
     # Calculate the final balance, assuming we sell any position at the end
     balance = position * price if position > 0 else balance
 
@@ -34,10 +47,59 @@ def backtest(price_history, signals, initial_balance=10000):
         "final_balance": round(balance),
         "profit_or_loss": balance - initial_balance,
         "profit_or_loss_percent": round((balance - initial_balance) / initial_balance * 100, 2),
+        "max_drawdown_percent": round(max_drawdown * 100, 2),
         "trade_count": trade_count
     }
 
 
+def backtest_timeframes(multi_timeframe_prices, intervals_mins, strategies_config, n_splits=None, train_fraction=0.7,
+                        initial_balance=10000):
+    """
+    Backtest every configured strategy on every timeframe derived from a single base candle series.
+
+    Args:
+    - multi_timeframe_prices: MultiTimeframePrices with the base series.
+    - intervals_mins: list of candle intervals to test, multiples of the base interval.
+    - strategies_config: dict of strategy name -> strategy params, as in config.yaml.
+    - n_splits: if given, also run walk-forward train/test splits instead of only the full series.
+    - train_fraction: fraction of each walk-forward window used for training.
+    - initial_balance: starting balance in your trading account.
+
+    Returns:
+    - DataFrame with one row per (interval, strategy, split, segment) and the backtest results as columns.
+      Segments too short for a strategy (or timeframes too short for the walk-forward splits) only have "skipped".
+    """
+    results = []
+    for interval_mins in intervals_mins:
+        # One read-only columnar view per timeframe, shared by all strategies and walk-forward segments
+        prices_history = PriceArrays.from_dataframe(multi_timeframe_prices.get(interval_mins))
+
+        segments = [("full", None, prices_history)]
+        if n_splits:
+            try:
+                for split, (train, test) in enumerate(walk_forward_splits(prices_history, n_splits, train_fraction)):
+                    segments.append(("train", split, train))
+                    segments.append(("test", split, test))
+            except ValueError as e:
+                for strategy_name in strategies_config:
+                    results.append({"interval_mins": interval_mins, "strategy": strategy_name, "segment": "walk_forward", "skipped": str(e)})
+
+        for strategy_name, strategy_params in strategies_config.items():
+            for segment_name, split, segment in segments:
+                result = {"interval_mins": interval_mins, "strategy": strategy_name, "segment": segment_name, "split": split}
+
+                strategy = StrategyFactory.get_strategy(strategy_name, segment, **strategy_params)
+                if len(segment) < strategy.min_candles:
+                    result["skipped"] = f"Not enough candles ({len(segment)}), {strategy.min_candles} needed"
+                else:
+                    strategy_signals = strategy.generate_signal()
+                    result.update(backtest(segment, strategy_signals, initial_balance))
+
+                results.append(result)
+
+    return pd.DataFrame(results)
+
+
 #
 # class Backtester:
 #     def __init__(self, strategy, initial_money):
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from src.kraken import initialize_kraken_api
+from src.old_trading.trades_archive import TimeBars, VolumeBars, ingest_trades
+from src.old_trading.utils import load_config
+
+
+def get_bar_aggregator(archive_config):
+    if archive_config.get("volume_per_bar"):
+        return VolumeBars(archive_config["volume_per_bar"])
+
+    return TimeBars(archive_config["bar_interval_secs"])
+
+
+def main():
+    config = load_config()
+    archive_config = config["archive"]
+
+    kraken = initialize_kraken_api()
+    archive = ingest_trades(
+        kraken.api,
+        config["general"]["pair"],
+        archive_config["path"],
+        get_bar_aggregator(archive_config),
+        start=datetime.fromisoformat(archive_config["start"]),
+    )
+    print(f"Candles archived in {archive.path}")
+
+
+if __name__ == "__main__":
+    main()
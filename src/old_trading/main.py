@@ -1,20 +1,94 @@
 import json
+import pandas as pd
 
+from src.config import pair_2_assets
 from src.kraken import initialize_kraken_api
-from src.old_trading.backtesting import backtest
-from src.old_trading.strategies import RSI, BollingerBands, StrategyFactory
+from src.old_trading.backtesting import backtest_timeframes
+from src.old_trading.ingest_trades import get_bar_aggregator
+from src.old_trading.portfolio_backtesting import backtest_portfolio
+from src.old_trading.resampling import MultiTimeframePrices
+from src.old_trading.robustness import run_robustness, summarize_robustness
+from src.old_trading.trades_archive import TradesArchive
 from src.old_trading.utils import load_config
 
-data_handler = initialize_kraken_api()
-config = load_config()
-prices_history = data_handler.get_prices_history(config["general"]["pair"], config["general"]["interval_mins"])
 
-for strategy_name, strategy_params in config["strategies"].items():
-    strategy = StrategyFactory.get_strategy(strategy_name, prices_history, **strategy_params)
-    strategy_signals = strategy.generate_signal()
-    strategy_results = backtest(prices_history, strategy_signals)
-    print(strategy_name, json.dumps(strategy_results, indent=4))
+def load_prices_history(config, pair, data_handler=None):
+    if config["general"].get("source") == "archive":
+        archive = TradesArchive(config["archive"]["path"], pair, get_bar_aggregator(config["archive"]).name)
+        return archive.load()
+
+    return data_handler.get_prices_history(pair, config["general"]["interval_mins"])
+
+
+def main():
+    config = load_config()
+    if config["general"].get("source") == "archive" and config["archive"].get("volume_per_bar"):
+        # Timeframes (and the portfolio alignment) are clock-time buckets, which volume bars don't fit in
+        raise ValueError("Volume bars can't be backtested as interval_mins candles, archive time bars instead")
+
+    data_handler = initialize_kraken_api() if config["general"].get("source") != "archive" else None
+    prices_history = load_prices_history(config, config["general"]["pair"], data_handler)
+    multi_timeframe_prices = MultiTimeframePrices(prices_history, config["general"]["interval_mins"])
+
+    walk_forward = config.get("walk_forward", {})
+    results = backtest_timeframes(
+        multi_timeframe_prices,
+        config["general"]["timeframes_mins"],
+        config["strategies"],
+        n_splits=walk_forward.get("n_splits"),
+        train_fraction=walk_forward.get("train_fraction", 0.7),
+    )
+
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        print(results)
+
+    robustness = config.get("robustness", {})
+    if robustness.get("n_paths"):
+        robustness_results = run_robustness(
+            multi_timeframe_prices.get(robustness["interval_mins"]),
+            config["strategies"],
+            n_paths=robustness["n_paths"],
+            method=robustness.get("method", "bootstrap"),
+            block_size=robustness.get("block_size", 24),
+            seed=robustness.get("seed"),
+        )
+
+        with pd.option_context("display.max_columns", None, "display.width", None):
+            print(summarize_robustness(robustness_results))
+
+    portfolio = config.get("portfolio", {})
+    if portfolio.get("enabled"):
+        prices_by_pair = {}
+        for pair in pair_2_assets:
+            try:
+                prices_by_pair[pair] = load_prices_history(config, pair, data_handler)
+            except FileNotFoundError as e:
+                # Only general.pair is archived unless ingest_trades.py was also run for the other pairs
+                print(f"Portfolio: skipping {pair}, {e}")
+
+        if not prices_by_pair:
+            print("Portfolio: no pair to backtest")
+            return
+
+        for strategy_name, strategy_params in config["strategies"].items():
+            try:
+                portfolio_results = backtest_portfolio(
+                    prices_by_pair,
+                    pair_2_assets,
+                    strategy_name,
+                    strategy_params,
+                    pair_weights=portfolio.get("pair_weights"),
+                    fee_percent=portfolio.get("fee_percent", 0.26),
+                )
+            except ValueError as e:
+                print(f"Portfolio: can't backtest {strategy_name}, {e}")
+                continue
+
+            print("Portfolio", strategy_name, json.dumps(portfolio_results, indent=4, default=float))
 
 
 # signals_table = pd.crosstab(rsi_signals, bollinger_signals, rownames=["RSI"], colnames=["Bollinger Bands"])
 
+
+if __name__ == "__main__":
+    main()
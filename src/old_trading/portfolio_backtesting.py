@@ -0,0 +1,181 @@
+from functools import reduce
+import numpy as np
+import pandas as pd
+
+from src.old_trading.price_arrays import PriceArrays
+from src.old_trading.strategies import StrategyFactory
+
+
+CASH_ASSET = "ZUSD"
+
+
+def align_prices(prices_by_pair):
+    """
+    Keep only the candle times present in every pair, so that rows of the 2D arrays line up.
+
+    Returns:
+    - times: DatetimeIndex of the common candle times
+    - dict of pair -> DataFrame of that pair's candles at those times
+    """
+    times = reduce(lambda a, b: a.intersection(b), [pd.Index(df["time"]) for df in prices_by_pair.values()])
+    aligned = {pair: df.set_index("time").loc[times].reset_index() for pair, df in prices_by_pair.items()}
+
+    return times, aligned
+
+
+def get_usd_prices(pairs, pair_2_assets, pair_prices):
+    """
+    Price in USD of every non-cash asset, from its USD pair or through a cross pair with an asset priced in USD.
+
+    Args:
+    - pairs: list of P pairs, in the column order of pair_prices.
+    - pair_2_assets: dict of pair -> (base asset, quote asset).
+    - pair_prices: array of shape (T, P) with the price of each pair, in its quote asset.
+
+    Returns:
+    - assets: list of A non-cash assets
+    - array of shape (T, A) with the USD price of each asset
+    """
+    assets = sorted({asset for pair in pairs for asset in pair_2_assets[pair] if asset != CASH_ASSET})
+
+    usd_prices = {CASH_ASSET: np.ones(len(pair_prices))}
+    while len(usd_prices) < len(assets) + 1:
+        resolved = len(usd_prices)
+        for col, pair in enumerate(pairs):
+            base, quote = pair_2_assets[pair]
+            if base not in usd_prices and quote in usd_prices:
+                usd_prices[base] = pair_prices[:, col] * usd_prices[quote]
+            elif quote not in usd_prices and base in usd_prices:
+                usd_prices[quote] = usd_prices[base] / pair_prices[:, col]
+
+        if len(usd_prices) == resolved:
+            missing = [asset for asset in assets if asset not in usd_prices]
+            raise ValueError(f"No pair chain to {CASH_ASSET} for {missing}")
+
+    return assets, np.column_stack([usd_prices[asset] for asset in assets])
+
+
+def signals_to_positions(signals):
+    """
+    Turn {-1, 0, 1} signals of shape (T, P) into boolean positions: long from a buy signal until the next sell signal
+    """
+    # Row of the last non-zero signal of each column, carried forward
+    last_signal_rows = np.where(signals != 0, np.arange(len(signals))[:, None], 0)
+    np.maximum.accumulate(last_signal_rows, axis=0, out=last_signal_rows)
+
+    return np.take_along_axis(signals, last_signal_rows, axis=0) == 1
+
+
+def get_target_weights(positions, pairs, pair_2_assets, assets, pair_weights):
+    """
+    Target portfolio weight of every non-cash asset, shape (T, A). The rest of the portfolio is cash.
+
+    Being long a USD pair moves its weight from cash to the base asset. Being long a cross pair (e.g. XETHXXBT)
+    then moves its weight from the quote asset to the base asset, capped by the weight the quote asset has.
+    """
+    weights = np.zeros((len(positions), len(assets)))
+    for col, pair in enumerate(pairs):
+        base, quote = pair_2_assets[pair]
+        if quote == CASH_ASSET:
+            weights[:, assets.index(base)] += positions[:, col] * pair_weights[col]
+
+    # Shared cash: scale down whenever the positions ask for more than the whole portfolio
+    weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1)
+
+    # Cross pairs only swap one asset for another, so they never change the total weight
+    for col, pair in enumerate(pairs):
+        base, quote = pair_2_assets[pair]
+        if quote != CASH_ASSET:
+            moved = np.minimum(positions[:, col] * pair_weights[col], weights[:, assets.index(quote)])
+            weights[:, assets.index(quote)] -= moved
+            weights[:, assets.index(base)] += moved
+
+    return weights
+
+
+def get_traded_legs(weight_changes, pairs, pair_2_assets, assets):
+    """
+    Volume traded at each time, as a fraction of the portfolio, counting each order (leg) once.
+
+    Moves between two assets with a direct cross pair take one leg, the rest goes through cash: one leg per asset.
+    """
+    buys = np.clip(weight_changes, 0, None)
+    sells = np.clip(-weight_changes, 0, None)
+    legs = buys.sum(axis=1) + sells.sum(axis=1)
+
+    for pair in pairs:
+        base, quote = pair_2_assets[pair]
+        if quote == CASH_ASSET:
+            continue
+
+        for bought, sold in [(base, quote), (quote, base)]:
+            b, s = assets.index(bought), assets.index(sold)
+            matched = np.minimum(buys[:, b], sells[:, s])
+            buys[:, b] -= matched
+            sells[:, s] -= matched
+            # A single cross pair order instead of a sell and a buy against cash
+            legs -= matched
+
+    return legs
+
+
+def backtest_portfolio(prices_by_pair, pair_2_assets, strategy_name, strategy_params, pair_weights=None,
+                       fee_percent=0.26, initial_balance=10000):
+    """
+    Backtest one strategy on several pairs at once, sharing a single cash balance.
+
+    Prices, signals and positions are aligned into (time x pair) and (time x asset) arrays and the whole
+    simulation runs as array operations. Between signals the holdings are kept at their target weights, and
+    the fees of every leg, including these rebalances, are charged at each candle close.
+
+    Args:
+    - prices_by_pair: dict of pair -> DataFrame of candles, as returned by Kraken.get_prices_history.
+    - pair_2_assets: dict of pair -> (base asset, quote asset), see src/config.py.
+    - strategy_name, strategy_params: strategy run on every pair, as in config.yaml.
+    - pair_weights: dict of pair -> portfolio weight while long that pair, defaults to an equal split.
+    - fee_percent: fee of each order, as a percentage of its volume.
+    - initial_balance: starting balance in your trading account, in USD.
+
+    Returns:
+    - A dictionary with final_balance, total_profit/loss, max drawdown, trade count and final asset weights.
+    """
+    pairs = list(prices_by_pair)
+    _, aligned = align_prices(prices_by_pair)
+
+    pair_prices = np.column_stack([aligned[pair]["price"].to_numpy() for pair in pairs])
+    assets, usd_prices = get_usd_prices(pairs, pair_2_assets, pair_prices)
+
+    signals = np.column_stack([
+        StrategyFactory.get_strategy(strategy_name, PriceArrays.from_dataframe(aligned[pair]), **strategy_params).generate_signal()
+        for pair in pairs
+    ])
+    positions = signals_to_positions(signals)
+
+    pair_weights = pair_weights or {pair: 1 / len(pairs) for pair in pairs}
+    weights = get_target_weights(positions, pairs, pair_2_assets, assets, np.array([pair_weights[pair] for pair in pairs]))
+
+    # Weights decided at the close of candle t are held during candle t + 1
+    returns = np.zeros_like(usd_prices)
+    returns[1:] = usd_prices[1:] / usd_prices[:-1] - 1
+    held_weights = np.zeros_like(weights)
+    held_weights[1:] = weights[:-1]
+
+    portfolio_returns = (held_weights * returns).sum(axis=1)
+    drifted_weights = held_weights * (1 + returns) / (1 + portfolio_returns)[:, None]
+    legs = get_traded_legs(weights - drifted_weights, pairs, pair_2_assets, assets)
+
+    equity = initial_balance * np.cumprod((1 + portfolio_returns) * (1 - legs * fee_percent / 100))
+    drawdowns = 1 - equity / np.maximum.accumulate(equity)
+    balance = equity[-1]
+
+    trade_counts = np.count_nonzero(np.diff(positions.astype(np.int8), axis=0), axis=0) + positions[0]
+
+    return {
+        "final_balance": round(balance),
+        "profit_or_loss": balance - initial_balance,
+        "profit_or_loss_percent": round((balance - initial_balance) / initial_balance * 100, 2),
+        "max_drawdown_percent": round(drawdowns.max() * 100, 2),
+        "trade_count": int(trade_counts.sum()),
+        "trade_count_by_pair": dict(zip(pairs, trade_counts.tolist())),
+        "final_weights": dict(zip(assets, weights[-1].round(3).tolist())),
+    }
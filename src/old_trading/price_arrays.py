@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+
+PRICE_COLUMNS = ("price", "open", "high", "low", "close", "volume")
+
+
+class PriceArrays:
+    """
+    Read-only columnar view of a candle series, shared by every strategy evaluated on it
+
+    Strategies never copy these arrays. Indicators are cached by key, so strategy variants that only
+    differ in their thresholds compute (and hold) each indicator once.
+
+    Attributes:
+        columns: dict of column name -> read-only numpy array
+    """
+    def __init__(self, columns):
+        self.columns = {}
+        for name, values in columns.items():
+            values = np.asarray(values)
+            values.flags.writeable = False
+            self.columns[name] = values
+
+        self._indicators = {}
+
+    @classmethod
+    def from_dataframe(cls, prices_history):
+        return cls({col: prices_history[col].to_numpy() for col in PRICE_COLUMNS if col in prices_history.columns})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            # Slices of the arrays are views, no data is copied
+            return PriceArrays({name: values[key] for name, values in self.columns.items()})
+
+        return self.columns[key]
+
+    @property
+    def iloc(self):
+        """
+        Positional slicing with the same syntax as a DataFrame, e.g. prices.iloc[100:200]
+        """
+        return self
+
+    def series(self, name):
+        """
+        Column as a pandas Series without copying, for libraries that expect pandas input
+        """
+        return pd.Series(self.columns[name], copy=False)
+
+    def indicator(self, key, compute):
+        """
+        Get a cached indicator, computing it with compute() the first time it is requested
+        """
+        if key not in self._indicators:
+            self._indicators[key] = compute()
+
+        return self._indicators[key]
+
+
+def as_price_arrays(prices):
+    if isinstance(prices, PriceArrays):
+        return prices
+
+    return PriceArrays.from_dataframe(prices)
@@ -0,0 +1,88 @@
+# How each candle column is combined when several base candles are merged into a coarser one
+OHLC_AGGREGATIONS = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "price": "last",
+    "volume": "sum",
+}
+
+
+def resample_ohlc(prices_history, interval_mins, base_interval_mins):
+    """
+    Aggregate a candle DataFrame (as returned by Kraken.get_prices_history) into coarser candles.
+
+    The first and last candles are dropped if the base series only covers part of them.
+
+    Args:
+    - prices_history: DataFrame with a "time" column and OHLC columns, sorted by time.
+    - interval_mins: size of the target candles, in minutes.
+    - base_interval_mins: size of the candles of prices_history, in minutes.
+
+    Returns:
+    - DataFrame with the same columns, one row per interval_mins candle.
+    """
+    aggregations = {col: agg for col, agg in OHLC_AGGREGATIONS.items() if col in prices_history.columns}
+
+    buckets = prices_history.resample(f"{interval_mins}min", on="time", origin="epoch")
+    resampled = buckets.agg(aggregations)
+
+    base_candles = buckets["close"].count()
+    partial_edges = [
+        bucket for bucket in dict.fromkeys([base_candles.index[0], base_candles.index[-1]])
+        if base_candles[bucket] < interval_mins // base_interval_mins
+    ]
+    resampled = resampled.drop(index=partial_edges)
+
+    # Buckets without any base candle (gaps in the data) have no prices
+    resampled = resampled.dropna(subset=["close"])
+
+    return resampled.reset_index()
+
+
+class MultiTimeframePrices:
+    """
+    Derives coarser timeframes from a single base candle series, caching each derived frame
+
+    Attributes:
+        base_interval_mins: interval of the base series, every derived interval must be a multiple of it
+    """
+    def __init__(self, base_prices_history, base_interval_mins):
+        self.base_interval_mins = base_interval_mins
+        self._frames = {base_interval_mins: base_prices_history}
+
+    def get(self, interval_mins):
+        if interval_mins % self.base_interval_mins != 0:
+            raise ValueError(f"Interval {interval_mins} is not a multiple of the base interval {self.base_interval_mins}")
+
+        if interval_mins not in self._frames:
+            base_prices_history = self._frames[self.base_interval_mins]
+            self._frames[interval_mins] = resample_ohlc(base_prices_history, interval_mins, self.base_interval_mins)
+
+        return self._frames[interval_mins]
+
+
+def walk_forward_splits(prices_history, n_splits, train_fraction=0.7):
+    """
+    Split a candle series into consecutive, non-overlapping walk-forward windows.
+
+    Works on DataFrames and on PriceArrays (whose slices are views of the shared arrays).
+    Each window is divided into a train part (first train_fraction of the candles) followed by a test part.
+
+    Returns:
+    - list of (train, test) slices of prices_history
+    """
+    window_size = len(prices_history) // n_splits
+    train_size = int(window_size * train_fraction)
+    if train_size == 0 or train_size == window_size:
+        raise ValueError(f"Not enough candles ({len(prices_history)}) for {n_splits} walk-forward splits")
+
+    splits = []
+    for split in range(n_splits):
+        start = split * window_size
+        train = prices_history.iloc[start:start + train_size]
+        test = prices_history.iloc[start + train_size:start + window_size]
+        splits.append((train, test))
+
+    return splits
@@ -0,0 +1,130 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from src.old_trading.backtesting import backtest
+from src.old_trading.price_arrays import PriceArrays, as_price_arrays
+from src.old_trading.strategies import StrategyFactory
+
+
+PATH_COLUMNS = ("price", "open", "high", "low", "close")
+
+REPORTED_METRICS = ["profit_or_loss_percent", "max_drawdown_percent", "trade_count"]
+
+
+def block_bootstrap_paths(prices_history, n_paths, n_candles, block_size, rng):
+    """
+    Generate synthetic candle paths by resampling blocks of consecutive candles.
+
+    Close-to-close returns are resampled in blocks of block_size candles (keeping short-term autocorrelation),
+    and open/high/low are rebuilt from their ratio to the close of the same candle.
+
+    Returns:
+    - dict of column name -> array of shape (n_paths, n_candles)
+    """
+    prices = as_price_arrays(prices_history)
+    close = prices["close"]
+
+    close_returns = close[1:] / close[:-1]
+    n_returns = len(close_returns)
+    if n_returns < block_size:
+        raise ValueError(f"Not enough candles ({len(close)}) for blocks of {block_size}")
+
+    n_blocks = math.ceil(n_candles / block_size)
+    block_starts = rng.integers(0, n_returns - block_size + 1, size=(n_paths, n_blocks))
+    indices = (block_starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_candles]
+
+    path_close = close[0] * np.cumprod(close_returns[indices], axis=1)
+    paths = {"price": path_close, "close": path_close}
+    for col in ("open", "high", "low"):
+        paths[col] = path_close * (prices[col][1:] / close[1:])[indices]
+
+    return paths
+
+
+def random_window_paths(prices_history, n_paths, n_candles, rng):
+    """
+    Take n_paths windows of n_candles consecutive real candles, starting at random offsets.
+
+    Returns:
+    - dict of column name -> array of shape (n_paths, n_candles)
+    """
+    prices = as_price_arrays(prices_history)
+    if len(prices) < n_candles:
+        raise ValueError(f"Not enough candles ({len(prices)}) for windows of {n_candles}")
+
+    offsets = rng.integers(0, len(prices) - n_candles + 1, size=n_paths)
+    indices = offsets[:, None] + np.arange(n_candles)
+
+    return {col: prices[col][indices] for col in PATH_COLUMNS}
+
+
+def _evaluate_paths(first_path, paths, strategies_config, initial_balance):
+    results = []
+    for i in range(len(paths["close"])):
+        prices = PriceArrays({col: values[i] for col, values in paths.items()})
+        for strategy_name, strategy_params in strategies_config.items():
+            strategy = StrategyFactory.get_strategy(strategy_name, prices, **strategy_params)
+            strategy_results = backtest(prices, strategy.generate_signal(), initial_balance)
+            results.append({"path": first_path + i, "strategy": strategy_name, **strategy_results})
+
+    return results
+
+
+def run_robustness(prices_history, strategies_config, n_paths=1000, n_candles=None, method="bootstrap", block_size=24,
+                   max_workers=None, seed=None, initial_balance=10000):
+    """
+    Backtest every configured strategy on many resampled price paths.
+
+    Args:
+    - prices_history: DataFrame or PriceArrays with the real candles the paths are generated from.
+    - strategies_config: dict of strategy name -> strategy params, as in config.yaml.
+    - n_paths: number of paths to generate.
+    - n_candles: length of each path, defaults to the whole series for "bootstrap" and half of it for "window".
+    - method: "bootstrap" (block bootstrap of returns) or "window" (random window offsets).
+    - block_size: candles per block for the bootstrap.
+    - max_workers: processes evaluating the paths, defaults to the number of CPUs.
+    - seed: seed for the random generator, for reproducible paths.
+    - initial_balance: starting balance in your trading account.
+
+    Returns:
+    - DataFrame with one row per (path, strategy) and the backtest results as columns.
+    """
+    rng = np.random.default_rng(seed)
+
+    if method == "bootstrap":
+        paths = block_bootstrap_paths(prices_history, n_paths, n_candles or len(prices_history), block_size, rng)
+    elif method == "window":
+        paths = random_window_paths(prices_history, n_paths, n_candles or len(prices_history) // 2, rng)
+    else:
+        raise ValueError("Invalid robustness method")
+
+    # A few chunks per worker, so that workers finishing early pick up more work
+    max_workers = max_workers or os.cpu_count()
+    chunk_size = math.ceil(n_paths / (max_workers * 4))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _evaluate_paths,
+                start,
+                {col: values[start:start + chunk_size] for col, values in paths.items()},
+                strategies_config,
+                initial_balance,
+            )
+            for start in range(0, n_paths, chunk_size)
+        ]
+        for future in futures:
+            results.extend(future.result())
+
+    return pd.DataFrame(results)
+
+
+def summarize_robustness(results):
+    """
+    Distribution of return, drawdown and trade count of each strategy across all paths
+    """
+    return results.groupby("strategy")[REPORTED_METRICS].describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95])
@@ -1,6 +1,9 @@
+import numpy as np
 import pandas_ta as ta
 from abc import abstractmethod, ABC
 
+from src.old_trading.price_arrays import as_price_arrays
+
 
 class StrategyFactory:
     @staticmethod
@@ -26,13 +29,20 @@ class Strategy(ABC):
     Strategy class
 
     Attributes:
-        signals: list of values in {-1, 0, 1} with length prices_history.shape[0]
-        prices_history: pandas dataframe with original columns + strategy-specific columns
+        signals: int8 numpy array of values in {-1, 0, 1} with length len(prices)
+        prices: PriceArrays with the candles, shared read-only with every other strategy on the same data
+        indicators: dict of indicator name -> numpy array, computed by the strategy
+        min_candles: fewest candles the strategy needs to compute its indicators
     """
+    min_candles = 1
+
     def __init__(self, prices_history):
         self.signals = None
-        self.prices_history = prices_history.copy()
-        self.prices_history["signal"] = 0
+        self.prices = as_price_arrays(prices_history)
+        self.indicators = {}
+
+    def _empty_signals(self):
+        return np.zeros(len(self.prices), dtype=np.int8)
 
     @abstractmethod
     def generate_signal(self):
@@ -41,7 +51,7 @@ class Strategy(ABC):
         1 means buy, -1 means sell, 0 means hold
 
         Returns:
-            list of values in {-1, 0, 1} as long as prices_history.shape[0]
+            int8 numpy array of values in {-1, 0, 1} as long as prices
         """
         pass
 
@@ -51,9 +61,9 @@ class DummyStrategy(Strategy):
     Dummy strategy
     """
     def generate_signal(self):
-        self.prices_history["signal"] = [0] * self.prices_history.shape[0]
+        self.signals = self._empty_signals()
 
-        return self.prices_history.signal
+        return self.signals
 
 
 class RSI(Strategy):
@@ -65,17 +75,22 @@ class RSI(Strategy):
         self.window = window
         self.rsi_threshold_buy = rsi_threshold_buy
         self.rsi_threshold_sell = rsi_threshold_sell
+        self.min_candles = window + 1
 
     def _compute_rsi(self):
-        self.prices_history['RSI'] = ta.rsi(self.prices_history.price, self.window)
+        self.indicators["RSI"] = self.prices.indicator(
+            ("RSI", self.window),
+            lambda: ta.rsi(self.prices.series("price"), self.window).to_numpy(),
+        )
 
     def generate_signal(self):
         self._compute_rsi()
 
-        self.prices_history.loc[self.prices_history["RSI"] < self.rsi_threshold_buy, "signal"] = 1
-        self.prices_history.loc[self.prices_history["RSI"] > self.rsi_threshold_sell, "signal"] = -1
+        self.signals = self._empty_signals()
+        self.signals[self.indicators["RSI"] < self.rsi_threshold_buy] = 1
+        self.signals[self.indicators["RSI"] > self.rsi_threshold_sell] = -1
 
-        return self.prices_history.signal
+        return self.signals
 
 
 class BollingerBands(Strategy):
@@ -86,19 +101,26 @@ class BollingerBands(Strategy):
         super().__init__(prices_history)
         self.window = window
         self.num_std_dev = float(num_std_dev)
+        self.min_candles = window
 
     def _compute_bollinger_bands(self):
-        bbands = ta.bbands(self.prices_history.price, self.window, self.num_std_dev)
-        self.prices_history["BBL"] = bbands[f"BBL_{self.window}_{self.num_std_dev}"]
-        self.prices_history["BBU"] = bbands[f"BBU_{self.window}_{self.num_std_dev}"]
+        def compute():
+            bbands = ta.bbands(self.prices.series("price"), self.window, self.num_std_dev)
+            return {
+                "BBL": bbands[f"BBL_{self.window}_{self.num_std_dev}"].to_numpy(copy=True),
+                "BBU": bbands[f"BBU_{self.window}_{self.num_std_dev}"].to_numpy(copy=True),
+            }
+
+        self.indicators.update(self.prices.indicator(("BBANDS", self.window, self.num_std_dev), compute))
 
     def generate_signal(self):
         self._compute_bollinger_bands()
 
-        self.prices_history.loc[self.prices_history["price"] < self.prices_history["BBL"], "signal"] = 1
-        self.prices_history.loc[self.prices_history["price"] > self.prices_history["BBU"], "signal"] = -1
+        self.signals = self._empty_signals()
+        self.signals[self.prices["price"] < self.indicators["BBL"]] = 1
+        self.signals[self.prices["price"] > self.indicators["BBU"]] = -1
 
-        return self.prices_history.signal
+        return self.signals
 
 
 class ParabolicSAR(Strategy):
@@ -109,16 +131,23 @@ class ParabolicSAR(Strategy):
         super().__init__(prices_history)
         self.acceleration = acceleration
         self.acceleration_max = acceleration_max
+        self.min_candles = 2
 
     def _compute_parabolic_sar(self):
-        psar = ta.psar(self.prices_history.high, self.prices_history.low, af=self.acceleration, max_af=self.acceleration_max)
-        self.prices_history["PSARl"] = psar[f"PSARl_{self.acceleration}_{self.acceleration_max}"]
-        self.prices_history["PSARs"] = psar[f"PSARs_{self.acceleration}_{self.acceleration_max}"]
+        def compute():
+            psar = ta.psar(self.prices.series("high"), self.prices.series("low"), af=self.acceleration, max_af=self.acceleration_max)
+            return {
+                "PSARl": psar[f"PSARl_{self.acceleration}_{self.acceleration_max}"].to_numpy(copy=True),
+                "PSARs": psar[f"PSARs_{self.acceleration}_{self.acceleration_max}"].to_numpy(copy=True),
+            }
+
+        self.indicators.update(self.prices.indicator(("PSAR", self.acceleration, self.acceleration_max), compute))
 
     def generate_signal(self):
         self._compute_parabolic_sar()
 
-        self.prices_history.loc[self.prices_history["price"] < self.prices_history["PSARl"], "signal"] = 1
-        self.prices_history.loc[self.prices_history["price"] > self.prices_history["PSARs"], "signal"] = -1
+        self.signals = self._empty_signals()
+        self.signals[self.prices["price"] < self.indicators["PSARl"]] = 1
+        self.signals[self.prices["price"] > self.indicators["PSARs"]] = -1
 
-        return self.prices_history.signal
+        return self.signals
@@ -0,0 +1,346 @@
+import bisect
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+
+
+def _to_nanos(timestamp):
+    # Kraken trade times have sub-millisecond decimals, round through microseconds to avoid float noise
+    return int(round(timestamp * 1e6)) * 1000
+
+
+def iter_trade_pages(api, pair, since=0, seen_ids=(), pause_secs=1.0):
+    """
+    Page through the public Trades endpoint, from since up to the latest trade.
+
+    Several trades can share a timestamp and a page can end in the middle of them, so each page is requested
+    from just before the timestamp of the previous page's last trade, and the trades already returned at that
+    timestamp are dropped by trade id.
+
+    Args:
+    - api: object with a get_recent_trades(pair, since) method, like KrakenAPI or RecordedTradesAPI.
+    - pair: Kraken pair, e.g. "XETHZUSD".
+    - since: nanosecond timestamp cursor, only trades after it are returned.
+    - seen_ids: ids of trades at timestamp since + 1 that were already processed.
+    - pause_secs: wait between calls, to stay under the public API rate limit.
+
+    Yields:
+    - lists of raw trades [price, volume, time, buy/sell, market/limit, misc, trade_id], oldest first
+    """
+    seen_ids = set(seen_ids)
+    while True:
+        response = api.get_recent_trades(pair, since)
+        if response.get("error"):
+            raise Exception(f"API error on trades endpoint: {response.get('error')}")
+
+        result = response["result"]
+        trades = next(value for key, value in result.items() if key != "last")
+        new_trades = [trade for trade in trades if trade[6] not in seen_ids]
+        if not new_trades:
+            return
+
+        yield new_trades
+
+        last_nanos = _to_nanos(float(trades[-1][2]))
+        ids_at_last = {trade[6] for trade in trades if _to_nanos(float(trade[2])) == last_nanos}
+        seen_ids = seen_ids | ids_at_last if last_nanos == int(since) + 1 else ids_at_last
+        since = last_nanos - 1
+
+        if pause_secs:
+            time.sleep(pause_secs)
+
+
+def iter_trades(pages):
+    """
+    Flatten trade pages into (time, price, volume, trade_id) tuples
+    """
+    for page in pages:
+        for trade in page:
+            yield float(trade[2]), float(trade[0]), float(trade[1]), trade[6]
+
+
+class BarAggregator(ABC):
+    """
+    Builds candles from trades, one trade at a time
+
+    Attributes:
+        name: identifies the bar type in the archive, e.g. "time_60s" or "volume_10"
+    """
+    name = None
+
+    def __init__(self):
+        self._bar = None
+        # Latest trade timestamp, with the ids of its trades already in closed bars and in the open bar
+        self._latest_time = None
+        self._closed_ids_at_latest = set()
+        self._open_ids_at_latest = set()
+
+    def _track_trade(self, trade_time, trade_id):
+        if trade_time != self._latest_time:
+            self._latest_time = trade_time
+            self._closed_ids_at_latest = set()
+            self._open_ids_at_latest = set()
+
+        self._open_ids_at_latest.add(trade_id)
+
+    def _new_bar(self, trade_time, price, volume, trade_id, bar_time):
+        # Trades at the same timestamp that went into previous bars must be skipped when resuming from this bar
+        closed_ids = set(self._closed_ids_at_latest) if trade_time == self._latest_time else set()
+        self._track_trade(trade_time, trade_id)
+
+        self._bar = {
+            "time": datetime.fromtimestamp(bar_time),
+            "open": price,
+            "high": price,
+            "low": price,
+            "close": price,
+            "price": price,
+            "volume": volume,
+            "trade_count": 1,
+            "first_trade_time": trade_time,
+            "closed_ids_at_first_trade_time": closed_ids,
+        }
+
+    def _update_bar(self, trade_time, price, volume, trade_id):
+        self._track_trade(trade_time, trade_id)
+
+        self._bar["high"] = max(self._bar["high"], price)
+        self._bar["low"] = min(self._bar["low"], price)
+        self._bar["close"] = price
+        self._bar["price"] = price
+        self._bar["volume"] += volume
+        self._bar["trade_count"] += 1
+
+    def _close_bar(self):
+        bar = self._bar
+        self._bar = None
+        self._closed_ids_at_latest |= self._open_ids_at_latest
+        self._open_ids_at_latest = set()
+        del bar["first_trade_time"]
+        del bar["closed_ids_at_first_trade_time"]
+
+        return bar
+
+    @property
+    def resume_state(self):
+        """
+        Trades cursor (and ids of trades to skip at it) to resume from, so that the bar still being built is
+        rebuilt from its first trade and no trade of a closed bar is counted again
+        """
+        if self._bar is None:
+            return {"since": _to_nanos(self._latest_time) - 1, "seen_ids": sorted(self._closed_ids_at_latest)}
+
+        return {
+            "since": _to_nanos(self._bar["first_trade_time"]) - 1,
+            "seen_ids": sorted(self._bar["closed_ids_at_first_trade_time"]),
+        }
+
+    @abstractmethod
+    def add(self, trade_time, price, volume, trade_id):
+        """
+        Add a trade, returning the bar it completes or None
+        """
+        pass
+
+
+class TimeBars(BarAggregator):
+    """
+    Candles of a fixed duration, any number of seconds (also sub-minute)
+    """
+    def __init__(self, interval_secs):
+        super().__init__()
+        self.interval_secs = interval_secs
+        self.name = f"time_{interval_secs}s"
+        self._bar_time = None
+
+    def add(self, trade_time, price, volume, trade_id):
+        bar_time = math.floor(trade_time / self.interval_secs) * self.interval_secs
+
+        completed_bar = None
+        if self._bar is not None and bar_time != self._bar_time:
+            completed_bar = self._close_bar()
+
+        if self._bar is None:
+            self._new_bar(trade_time, price, volume, trade_id, bar_time)
+            self._bar_time = bar_time
+        else:
+            self._update_bar(trade_time, price, volume, trade_id)
+
+        return completed_bar
+
+
+class VolumeBars(BarAggregator):
+    """
+    Candles that close once they accumulate volume_per_bar units of the base asset
+    """
+    def __init__(self, volume_per_bar):
+        super().__init__()
+        self.volume_per_bar = volume_per_bar
+        self.name = f"volume_{volume_per_bar}"
+
+    def add(self, trade_time, price, volume, trade_id):
+        if self._bar is None:
+            self._new_bar(trade_time, price, volume, trade_id, trade_time)
+        else:
+            self._update_bar(trade_time, price, volume, trade_id)
+
+        if self._bar["volume"] >= self.volume_per_bar:
+            return self._close_bar()
+
+        return None
+
+
+def aggregate_trades(trades, bar_aggregator):
+    """
+    Turn a stream of (time, price, volume, trade_id) trades into a stream of completed bars
+    """
+    for trade_time, price, volume, trade_id in trades:
+        bar = bar_aggregator.add(trade_time, price, volume, trade_id)
+        if bar is not None:
+            yield bar
+
+
+def iter_chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+class TradesArchive:
+    """
+    Local parquet archive of candles built from trades, one directory per pair and bar type
+
+    Candles are written in numbered part files. checkpoint.json holds the trades cursor to resume from and the
+    number of parts written before it, and is only updated after the part with the candles before that cursor
+    has been written. Parts written after the last checkpoint (e.g. by a crash in between) are ignored.
+    """
+    def __init__(self, root, pair, bars_name):
+        self.path = Path(root) / f"{pair}_{bars_name}"
+        self.checkpoint_file = self.path / "checkpoint.json"
+
+    def load_checkpoint(self):
+        if not self.checkpoint_file.exists():
+            return None
+
+        with open(self.checkpoint_file) as f:
+            return json.load(f)
+
+    def _checkpointed_parts(self):
+        checkpoint = self.load_checkpoint()
+        parts = sorted(self.path.glob("part-*.parquet"))
+
+        return parts[:checkpoint["parts"]] if checkpoint else []
+
+    def write(self, bars, resume_state):
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        part_number = len(self._checkpointed_parts())
+        pd.DataFrame(bars).to_parquet(self.path / f"part-{part_number:06d}.parquet", index=False)
+
+        # Write to a temporary file first, so a crash never leaves a half-written checkpoint
+        tmp_file = self.checkpoint_file.with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump({**resume_state, "parts": part_number + 1}, f)
+        tmp_file.replace(self.checkpoint_file)
+
+    def load(self):
+        parts = self._checkpointed_parts()
+        if not parts:
+            raise FileNotFoundError(f"No candles archived in {self.path}")
+
+        candles = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+        return candles
+
+
+def ingest_trades(api, pair, archive_root, bar_aggregator, start=None, chunk_size=10000, pause_secs=1.0):
+    """
+    Download trades of a pair and archive them as candles, resuming from the last checkpoint if there is one.
+
+    Memory use is bounded by chunk_size candles plus one page of trades, whatever the length of the history.
+
+    Args:
+    - api: object with a get_recent_trades(pair, since) method, like KrakenAPI or RecordedTradesAPI.
+    - pair: Kraken pair, e.g. "XETHZUSD".
+    - archive_root: directory of the local archive.
+    - bar_aggregator: TimeBars or VolumeBars instance.
+    - start: datetime of the first trade to download when there is no checkpoint yet.
+    - chunk_size: candles per archive part file (and per checkpoint).
+    - pause_secs: wait between calls to the Trades endpoint.
+
+    Returns:
+    - the TradesArchive the candles were written to
+    """
+    archive = TradesArchive(archive_root, pair, bar_aggregator.name)
+
+    checkpoint = archive.load_checkpoint()
+    if checkpoint is None:
+        checkpoint = {"since": _to_nanos(start.timestamp()) if start else 0, "seen_ids": []}
+
+    pages = iter_trade_pages(api, pair, checkpoint["since"], checkpoint["seen_ids"], pause_secs)
+    bars = aggregate_trades(iter_trades(pages), bar_aggregator)
+    for chunk in iter_chunks(bars, chunk_size):
+        archive.write(chunk, bar_aggregator.resume_state)
+
+    return archive
+
+
+class RecordingTradesAPI:
+    """
+    Wraps an api and saves every Trades endpoint response to a JSON lines file, to replay it later
+    """
+    def __init__(self, api, recording_file):
+        self.api = api
+        self.recording_file = recording_file
+
+    def get_recent_trades(self, pair, since=0):
+        response = self.api.get_recent_trades(pair, since)
+        with open(self.recording_file, "a") as f:
+            f.write(json.dumps({"pair": pair, "since": since, "response": response}) + "\n")
+
+        return response
+
+
+class RecordedTradesAPI:
+    """
+    Serves recorded trades with the same paging behaviour as the Trades endpoint, without network access
+    """
+    def __init__(self, trades_by_pair, page_size=1000):
+        self.page_size = page_size
+        self._trades = {}
+        self._nanos = {}
+        for pair, trades in trades_by_pair.items():
+            trades = sorted(trades, key=lambda trade: float(trade[2]))
+            self._trades[pair] = trades
+            self._nanos[pair] = [_to_nanos(float(trade[2])) for trade in trades]
+
+    @classmethod
+    def from_recording(cls, recording_file, page_size=1000):
+        trades_by_pair = {}
+        with open(recording_file) as f:
+            for line in f:
+                recorded = json.loads(line)
+                result = recorded["response"].get("result", {})
+                trades = next((value for key, value in result.items() if key != "last"), [])
+                # Keyed by trade id, so pages recorded more than once are not duplicated
+                trades_by_pair.setdefault(recorded["pair"], {}).update({trade[6]: trade for trade in trades})
+
+        return cls({pair: list(trades.values()) for pair, trades in trades_by_pair.items()}, page_size)
+
+    def get_recent_trades(self, pair, since=0):
+        nanos = self._nanos.get(pair, [])
+        first = bisect.bisect_right(nanos, int(since))
+        trades = self._trades.get(pair, [])[first:first + self.page_size]
+        last = nanos[first + len(trades) - 1] if trades else int(since)
+
+        return {"error": [], "result": {pair: trades, "last": str(last)}}
@@ -0,0 +1,165 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+
+_NULL_CONTEXT = nullcontext()
+
+
+class RenderProfiler:
+    """
+    Times named sections of a dashboard rerun, keeping rolling statistics across reruns
+
+    Each section records its wall time, the CPU time of the thread running it and the time spent waiting on the
+    network (requests wrapped in network()). When disabled, section() and network() return a shared no-op context
+    and profiled functions are called directly, so instrumentation costs a single attribute check.
+
+    Attributes:
+        enabled: whether sections are timed
+        last_cprofile_path: file with the cProfile stats of the last profiled rerun, if any
+        last_cprofile_text: top functions by cumulative time of the last profiled rerun, if any
+    """
+    def __init__(self, enabled=False, history=50):
+        self.enabled = enabled
+        self.last_cprofile_path = None
+        self.last_cprofile_text = None
+        self._cprofile_requested = False
+        self._new_cprofile = False
+        # section name -> deque of (wall, cpu, network) seconds
+        self._timings = defaultdict(lambda: deque(maxlen=history))
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+
+        return self._local.stack
+
+    def section(self, name):
+        if not self.enabled:
+            return _NULL_CONTEXT
+
+        return self._section(name)
+
+    @contextmanager
+    def _section(self, name):
+        stack = self._stack()
+        network_secs = [0.0]
+        stack.append(network_secs)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stack.pop()
+            self._timings[name].append((wall, cpu, network_secs[0]))
+
+    def network(self):
+        if not self.enabled:
+            return _NULL_CONTEXT
+
+        return self._network()
+
+    @contextmanager
+    def _network(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            # Network wait counts for every enclosing section, as all of them include it in their wall time
+            for network_secs in self._stack():
+                network_secs[0] += elapsed
+
+    def profiled(self, func):
+        """
+        Decorator timing every call of func as a section named after it.
+        If the first argument is a string (e.g. an asset), it is added to the name: ui_trade_asset(XETH)
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+
+            name = func.__name__
+            if args and isinstance(args[0], str):
+                name = f"{name}({args[0]})"
+
+            with self._section(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def request_cprofile(self):
+        """
+        Profile the next rerun with cProfile
+        """
+        self._cprofile_requested = True
+
+    def run(self, func):
+        """
+        Run a whole rerun as the "rerun" section, under cProfile if it was requested
+        """
+        if not self.enabled:
+            return func()
+
+        if not self._cprofile_requested:
+            with self._section("rerun"):
+                return func()
+
+        self._cprofile_requested = False
+        profile = cProfile.Profile()
+        try:
+            with self._section("rerun"):
+                return profile.runcall(func)
+        finally:
+            self.last_cprofile_path = f"profile_{time.strftime('%Y%m%d_%H%M%S')}.prof"
+            profile.dump_stats(self.last_cprofile_path)
+
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(30)
+            self.last_cprofile_text = text.getvalue()
+            self._new_cprofile = True
+
+    def take_new_cprofile(self):
+        """
+        True once after a rerun was profiled with cProfile, whose stats could not be shown during that rerun
+        """
+        new_cprofile = self._new_cprofile
+        self._new_cprofile = False
+
+        return new_cprofile
+
+    def summary(self):
+        """
+        Rolling statistics per section, in milliseconds
+
+        Returns:
+            list of dicts, one per section, slowest mean wall time first
+        """
+        rows = []
+        for name, timings in self._timings.items():
+            walls = sorted(wall for wall, _, _ in timings)
+            rows.append({
+                "section": name,
+                "runs": len(timings),
+                "last_ms": timings[-1][0] * 1000,
+                "wall_mean_ms": sum(walls) / len(walls) * 1000,
+                "wall_p95_ms": walls[min(len(walls) - 1, int(len(walls) * 0.95))] * 1000,
+                "cpu_mean_ms": sum(cpu for _, cpu, _ in timings) / len(timings) * 1000,
+                "network_mean_ms": sum(network for _, _, network in timings) / len(timings) * 1000,
+            })
+
+        return sorted(rows, key=lambda row: row["wall_mean_ms"], reverse=True)
+
+
+profiler = RenderProfiler(enabled=os.environ.get("CRYPTO_MANAGER_PROFILE") == "1")
@@ -1,3 +1,13 @@
+import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import pair_2_assets
+
+
+CASH_ASSET = "ZUSD"
+
+
 def get_target_proportion_dollars_eth(price):
     """
     Get the target proportion of dollars allocated to ETH based on the current price.
@@ -20,6 +30,36 @@ def get_target_proportion_dollars_eth(price):
         return round(K_SCALER / (price ** N_EXPONENT), 3)
 
 
+def get_drift_price(eth_units, dollars_liquid, drift, price_min=1.0, price_max=1e7):
+    """
+    Get the ETH price at which the ETH proportion drifts `drift` away from its target, for the given balances.
+    Positive drift means ETH above its target (time to SELL), negative below it (time to BUY).
+
+    The ETH proportion grows with the price and the target proportion never does, so their difference is
+    increasing in the price and the crossing point is found by bisection. Returns None if it is out of range,
+    or if there is neither ETH nor dollars.
+    """
+    if eth_units == 0 and dollars_liquid == 0:
+        return None
+
+    def drift_at(price):
+        dollars_eth = eth_units * price
+        return dollars_eth / (dollars_eth + dollars_liquid) - get_target_proportion_dollars_eth(price)
+
+    if not drift_at(price_min) < drift < drift_at(price_max):
+        return None
+
+    low, high = price_min, price_max
+    for _ in range(100):
+        mid = (low * high) ** 0.5  # Bisect on a log scale, prices span several orders of magnitude
+        if drift_at(mid) < drift:
+            low = mid
+        else:
+            high = mid
+
+    return high
+
+
 def analyze_and_trade(eth_units, eth_price, dollars_liquid):
     dollars_eth = eth_units * eth_price
     dollars_total = dollars_eth + dollars_liquid
@@ -42,3 +82,151 @@ def analyze_and_trade(eth_units, eth_price, dollars_liquid):
 
     return action, amount
 
+
+def _find_pair(asset_a, asset_b):
+    for pair, assets in pair_2_assets.items():
+        if set(assets) == {asset_a, asset_b}:
+            return pair
+
+    return None
+
+
+def _make_order(sold, bought, amount_usd, prices_usd, order_limits):
+    """
+    Market order selling amount_usd of `sold` for `bought`, or None if it is under the pair's minimum order
+    """
+    pair = _find_pair(sold, bought)
+    base, _ = pair_2_assets[pair]
+    buy_or_sell = "buy" if base == bought else "sell"
+
+    # Volumes are in the base asset, rounded down to the pair's lot step
+    lot_step = 10 ** -order_limits[pair]["lot_decimals"]
+    volume = math.floor(amount_usd / prices_usd[base] / lot_step) * lot_step
+    if volume < order_limits[pair]["ordermin"]:
+        return None
+
+    return {"pair": pair, "type": buy_or_sell, "volume": round(volume, order_limits[pair]["lot_decimals"]), "value_usd": float(amount_usd)}
+
+
+def get_rebalance_orders(balances, prices_usd, target_weights, order_limits):
+    """
+    Get the orders that bring a portfolio to its target weights with few legs and low fees.
+
+    Cross pairs (e.g. XETHXXBT) are used first between assets to sell and assets to buy, since they take one order
+    (and one fee) instead of two through ZUSD. What remains is sold to or bought with ZUSD, one order per asset.
+    Orders under the pair's minimum order volume are dropped.
+
+    Args:
+    - balances: dict of asset -> units held.
+    - prices_usd: dict of asset -> current USD price, for every non-USD asset held or in target_weights.
+    - target_weights: dict of asset -> target weight, including ZUSD. Weights are normalized to add up to 1.
+      Held assets missing from it have a target weight of 0, so they are sold.
+    - order_limits: dict of pair -> {"ordermin", "lot_decimals"}, see Kraken.get_pair_order_limits.
+
+    Returns:
+    - list of orders {"pair", "type", "volume", "value_usd"}
+    """
+    assets = list(dict.fromkeys([*target_weights, *(asset for asset, units in balances.items() if units)]))
+    prices = np.array([1.0 if asset == CASH_ASSET else prices_usd[asset] for asset in assets])
+    values = np.array([balances.get(asset, 0) for asset in assets]) * prices
+    weights = np.array([target_weights.get(asset, 0) for asset in assets], dtype=float)
+    weights /= weights.sum()
+
+    # Positive: USD to buy of the asset, negative: USD to sell
+    deltas = dict(zip(assets, weights * values.sum() - values))
+    to_sell = {asset: -delta for asset, delta in deltas.items() if delta < 0 and asset != CASH_ASSET}
+    to_buy = {asset: delta for asset, delta in deltas.items() if delta > 0 and asset != CASH_ASSET}
+
+    orders = []
+    # Largest amounts first, so that cross pairs cover as much volume as possible
+    for sold in sorted(to_sell, key=to_sell.get, reverse=True):
+        for bought in sorted(to_buy, key=to_buy.get, reverse=True):
+            if _find_pair(sold, bought) is None:
+                continue
+
+            amount_usd = min(to_sell[sold], to_buy[bought])
+            order = _make_order(sold, bought, amount_usd, prices_usd, order_limits)
+            if order is not None:
+                orders.append(order)
+                to_sell[sold] -= amount_usd
+                to_buy[bought] -= amount_usd
+
+    for sold, amount_usd in to_sell.items():
+        order = _make_order(sold, CASH_ASSET, amount_usd, prices_usd, order_limits)
+        if order is not None:
+            orders.append(order)
+
+    for bought, amount_usd in to_buy.items():
+        order = _make_order(CASH_ASSET, bought, amount_usd, prices_usd, order_limits)
+        if order is not None:
+            orders.append(order)
+
+    return orders
+
+
+def _scale_order(order, scale, order_limits):
+    """
+    Same order with its volume multiplied by scale, or None if that puts it under the pair's minimum order
+    """
+    lot_decimals = order_limits[order["pair"]]["lot_decimals"]
+    lot_step = 10 ** -lot_decimals
+    volume = math.floor(order["volume"] * scale / lot_step) * lot_step
+    if volume < order_limits[order["pair"]]["ordermin"]:
+        return None
+
+    return {**order, "volume": round(volume, lot_decimals), "value_usd": order["value_usd"] * scale}
+
+
+def submit_orders(kraken, orders, order_limits, fee_percent=0.26, max_workers=1):
+    """
+    Submit market orders in two batches: first the ones that get ZUSD or trade two non-USD assets,
+    then the ones that spend ZUSD.
+
+    The second batch is sized from the ZUSD balance read after the first one (which is net of its fees), leaving
+    room for the fees of the buys themselves.
+
+    Orders are sent one at a time by default. With max_workers > 1 the orders of a batch are sent concurrently,
+    which needs a nonce window on the API key, since requests can reach Kraken out of nonce order.
+
+    Returns:
+    - list of (order, True if it was accepted)
+    """
+    spends_usd = [
+        order for order in orders
+        if order["type"] == "buy" and pair_2_assets[order["pair"]][1] == CASH_ASSET
+    ]
+    first_batch = [order for order in orders if order not in spends_usd]
+
+    def submit(order):
+        return kraken.add_market_order(order["pair"], order["type"], order["volume"])
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results.extend(zip(first_batch, executor.map(submit, first_batch)))
+
+        if spends_usd:
+            dollars_available = kraken.get_assets_balances().get(CASH_ASSET, 0)
+            dollars_needed = sum(order["value_usd"] for order in spends_usd) * (1 + fee_percent / 100)
+            scale = min(1, dollars_available / dollars_needed)
+
+            second_batch = [order for order in (_scale_order(order, scale, order_limits) for order in spends_usd) if order]
+            results.extend(zip(second_batch, executor.map(submit, second_batch)))
+
+    return results
+
+
+def rebalance(kraken, target_weights, fee_percent=0.26, max_workers=1, dry_run=False):
+    """
+    Rebalance the Kraken account to target_weights (asset -> weight, including ZUSD).
+    With dry_run, orders are only computed and returned, as (order, None).
+    """
+    balances = kraken.get_assets_balances()
+    prices_usd = kraken.get_current_prices()
+    pairs = list(pair_2_assets)
+    order_limits = kraken.get_pair_order_limits(pairs)
+
+    orders = get_rebalance_orders(balances, prices_usd, target_weights, order_limits)
+    if dry_run:
+        return [(order, None) for order in orders]
+
+    return submit_orders(kraken, orders, order_limits, fee_percent, max_workers)
@@ -0,0 +1,52 @@
+from src.alerts import AlertEngine
+from src.trade_rebalance import get_drift_price
+
+
+PAIR = "XETHZUSD"
+
+
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def send(self, event):
+        self.events.append(event)
+
+
+def make_engine(price):
+    sink = ListSink()
+    alert_engine = AlertEngine(sinks=[sink])
+    alert_engine.on_price(PAIR, price)
+
+    return alert_engine, sink
+
+
+def test_percent_move_triggers_when_crossed():
+    alert_engine, sink = make_engine(2000)
+    alert_engine.add_percent_move(PAIR, 2000, 5)
+
+    assert alert_engine.on_price(PAIR, 2090) == []
+    assert [alert.kind for alert in alert_engine.on_price(PAIR, 2110)] == ["percent_move"]
+    assert len(sink.events) == 1
+
+
+def test_percent_move_already_crossed_triggers_on_registration():
+    alert_engine, sink = make_engine(2000)
+    alert_engine.add_percent_move(PAIR, 1800, 5)
+
+    assert [event["kind"] for event in sink.events] == ["percent_move"]
+    # Triggered once, not again on the next ticks
+    assert alert_engine.on_price(PAIR, 2010) == []
+    assert len(sink.events) == 1
+
+
+def test_proportion_drift_already_crossed_triggers_on_registration():
+    # 10 ETH and $100: the ETH proportion is far above its target at any realistic price
+    alert_engine, sink = make_engine(2000)
+    alert_engine.add_proportion_drift(PAIR, 10, 100, 0.05)
+
+    assert [event["kind"] for event in sink.events] == ["proportion_drift"]
+
+
+def test_drift_price_without_eth_nor_dollars():
+    assert get_drift_price(0, 0, 0.05) is None
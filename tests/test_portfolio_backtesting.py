@@ -0,0 +1,40 @@
+import numpy as np
+
+from src.old_trading.portfolio_backtesting import get_target_weights
+
+
+PAIRS = ["XXBTZUSD", "XETHZUSD", "XETHXXBT"]
+PAIR_2_ASSETS = {
+    "XXBTZUSD": ("XXBT", "ZUSD"),
+    "XETHZUSD": ("XETH", "ZUSD"),
+    "XETHXXBT": ("XETH", "XXBT"),
+}
+ASSETS = ["XETH", "XXBT"]
+PAIR_WEIGHTS = np.array([1 / 3, 1 / 3, 1 / 3])
+
+
+def target_weights(*positions):
+    return get_target_weights(np.array(positions, dtype=bool), PAIRS, PAIR_2_ASSETS, ASSETS, PAIR_WEIGHTS)
+
+
+def test_cross_pair_without_quote_asset_buys_nothing():
+    # Long ETH/BTC without holding any BTC: there is nothing to pay the ETH with
+    np.testing.assert_allclose(target_weights([False, False, True]), [[0, 0]])
+
+
+def test_cross_pair_moves_weight_from_quote_asset():
+    np.testing.assert_allclose(target_weights([True, False, True]), [[1 / 3, 0]])
+
+
+def test_cross_pair_is_capped_by_quote_asset_weight():
+    pair_weights = np.array([0.1, 0.2, 0.5])
+    weights = get_target_weights(np.array([[True, True, True]]), PAIRS, PAIR_2_ASSETS, ASSETS, pair_weights)
+
+    np.testing.assert_allclose(weights, [[0.3, 0]])
+
+
+def test_usd_pairs_share_cash():
+    pair_weights = np.array([0.8, 0.8, 0])
+    weights = get_target_weights(np.array([[True, True, False]]), PAIRS, PAIR_2_ASSETS, ASSETS, pair_weights)
+
+    np.testing.assert_allclose(weights, [[0.5, 0.5]])
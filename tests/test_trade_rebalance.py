@@ -0,0 +1,76 @@
+from src.config import pair_order_limits
+from src.trade_rebalance import get_rebalance_orders, submit_orders
+
+
+PRICES_USD = {"XXBT": 100000.0, "XETH": 2500.0}
+
+
+class FakeKraken:
+    """
+    Accepts every order and reports a fixed ZUSD balance once they are submitted
+    """
+    def __init__(self, balances):
+        self.balances = balances
+        self.submitted = []
+
+    def add_market_order(self, pair, buy_or_sell, volume):
+        self.submitted.append((pair, buy_or_sell, volume))
+        return True
+
+    def get_assets_balances(self):
+        return self.balances
+
+
+def test_cross_pair_instead_of_two_usd_legs():
+    orders = get_rebalance_orders({"XXBT": 0.1}, PRICES_USD, {"XXBT": 0.5, "XETH": 0.5}, pair_order_limits)
+
+    assert orders == [{"pair": "XETHXXBT", "type": "buy", "volume": 2.0, "value_usd": 5000.0}]
+
+
+def test_volume_rounded_down_to_lot_step():
+    order_limits = {pair: {"ordermin": 0.002, "lot_decimals": 2} for pair in pair_order_limits}
+    # $1010 / $2500 = 0.404 ETH
+    orders = get_rebalance_orders({"ZUSD": 1010}, PRICES_USD, {"XETH": 1}, order_limits)
+
+    assert [order["volume"] for order in orders] == [0.4]
+
+
+def test_orders_under_minimum_are_dropped():
+    # $2 of ETH to buy is 0.0008 ETH, under the 0.002 minimum
+    orders = get_rebalance_orders({"ZUSD": 1000, "XETH": 0.3984}, PRICES_USD, {"XETH": 0.5, "ZUSD": 0.5}, pair_order_limits)
+
+    assert orders == []
+
+
+def test_held_assets_missing_from_targets_are_sold():
+    orders = get_rebalance_orders({"XXBT": 1.0, "ZUSD": 100}, PRICES_USD, {"XETH": 1}, pair_order_limits)
+
+    assert [(order["pair"], order["type"]) for order in orders] == [("XETHXXBT", "buy"), ("XETHZUSD", "buy")]
+    assert sum(order["value_usd"] for order in orders) == 100100
+
+
+def test_usd_buys_scaled_to_balance_after_sells():
+    orders = [
+        {"pair": "XXBTZUSD", "type": "sell", "volume": 0.1, "value_usd": 10000.0},
+        {"pair": "XETHZUSD", "type": "buy", "volume": 4.0, "value_usd": 10000.0},
+    ]
+    # The sell fee leaves less ZUSD than the buy was sized for
+    kraken = FakeKraken({"ZUSD": 9974.0})
+
+    results = submit_orders(kraken, orders, pair_order_limits, fee_percent=0.26)
+
+    assert kraken.submitted[0] == ("XXBTZUSD", "sell", 0.1)
+    pair, buy_or_sell, volume = kraken.submitted[1]
+    assert (pair, buy_or_sell) == ("XETHZUSD", "buy")
+    assert volume * PRICES_USD["XETH"] * 1.0026 <= 9974.0
+    assert volume > 3.97
+    assert all(accepted for _, accepted in results)
+
+
+def test_usd_buys_not_scaled_with_enough_balance():
+    orders = [{"pair": "XETHZUSD", "type": "buy", "volume": 4.0, "value_usd": 10000.0}]
+    kraken = FakeKraken({"ZUSD": 20000.0})
+
+    submit_orders(kraken, orders, pair_order_limits)
+
+    assert kraken.submitted == [("XETHZUSD", "buy", 4.0)]
@@ -0,0 +1,90 @@
+import json
+import random
+
+import pytest
+
+from src.old_trading.trades_archive import (
+    RecordedTradesAPI,
+    RecordingTradesAPI,
+    TimeBars,
+    VolumeBars,
+    ingest_trades,
+    iter_trade_pages,
+)
+
+
+PAIR = "XETHZUSD"
+
+
+def make_trades(n_timestamps=1000, fills_per_timestamp=3):
+    rng = random.Random(0)
+    trades = []
+    trade_time = 1700000000.0
+    for _ in range(n_timestamps):
+        trade_time = round(trade_time + rng.uniform(0.1, 5), 4)
+        # Several fills of the same order share a timestamp
+        for _ in range(fills_per_timestamp):
+            trades.append([f"{2000 + rng.uniform(-50, 50):.2f}", f"{rng.uniform(0.01, 2):.8f}", trade_time, "b", "m", "", len(trades)])
+
+    return trades
+
+
+class InterruptedAPI:
+    """
+    Fails after a number of calls, like a network error or a killed process
+    """
+    def __init__(self, api, calls_before_failure):
+        self.api = api
+        self.calls_left = calls_before_failure
+
+    def get_recent_trades(self, pair, since=0):
+        if self.calls_left == 0:
+            raise ConnectionError("Interrupted")
+
+        self.calls_left -= 1
+        return self.api.get_recent_trades(pair, since)
+
+
+@pytest.fixture
+def recorded_api(tmp_path):
+    # Record the pages once, then replay them from the recording
+    recording_file = tmp_path / "recording.jsonl"
+    recording_api = RecordingTradesAPI(RecordedTradesAPI({PAIR: make_trades()}, page_size=500), recording_file)
+    ingest_trades(recording_api, PAIR, tmp_path / "recording_archive", TimeBars(60), pause_secs=0)
+
+    return RecordedTradesAPI.from_recording(recording_file, page_size=500)
+
+
+def test_replay_returns_every_trade_once(recorded_api):
+    trades = make_trades()
+    replayed = [trade for page in iter_trade_pages(recorded_api, PAIR, pause_secs=0) for trade in page]
+
+    assert [trade[6] for trade in replayed] == [trade[6] for trade in trades]
+
+
+@pytest.mark.parametrize("bar_aggregator_factory", [lambda: TimeBars(60), lambda: TimeBars(15), lambda: VolumeBars(5)])
+def test_resumed_ingestion_matches_single_run(tmp_path, recorded_api, bar_aggregator_factory):
+    single_run = ingest_trades(recorded_api, PAIR, tmp_path / "single", bar_aggregator_factory(), chunk_size=7, pause_secs=0)
+
+    resumed_root = tmp_path / "resumed"
+    while True:
+        try:
+            resumed = ingest_trades(InterruptedAPI(recorded_api, 2), PAIR, resumed_root, bar_aggregator_factory(), chunk_size=7, pause_secs=0)
+            break
+        except ConnectionError:
+            pass
+
+    single_candles = single_run.load()
+    resumed_candles = resumed.load()
+    assert resumed_candles.equals(single_candles)
+    assert single_candles["trade_count"].sum() > 0.99 * len(make_trades())
+
+
+def test_checkpoint_is_written_after_each_chunk(tmp_path, recorded_api):
+    archive = ingest_trades(recorded_api, PAIR, tmp_path, TimeBars(60), chunk_size=10, pause_secs=0)
+
+    with open(archive.checkpoint_file) as f:
+        checkpoint = json.load(f)
+
+    assert checkpoint["parts"] == len(list(archive.path.glob("part-*.parquet")))
+